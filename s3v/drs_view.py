@@ -1,3 +1,5 @@
+import re
+from collections import defaultdict
 from s3v.skin import _i, _e
 
 def __get_collapsed(collapse, drs=None):
@@ -17,71 +19,85 @@ def __get_collapsed(collapse, drs=None):
         
     return collapsed
 
+def drs_process(contents, collapsed, skipped=()):
+    """ Turn collected drs contents (and any skipped files) into output lines """
+    lines = []
+    for k in contents:
+        content = sorted(contents[k])
+        if k in collapsed and len(content) > 2:
+            lines.append(f"{_i(k)} : {_e(f'[{content[0]} ... {content[-1]}] (len={len(content)})')}")
+        else: 
+            lines.append(f'{_i(k)} : {_e(content)}')
+
+    if len(skipped) > 0:
+        lines.append('')
+        lines.append("The following files did not match the drs structure")
+        lines.extend([_e(f) for f in skipped])
+    return lines
+
 def drs_view(myfiles, drs, collapse='[]'):
     """ 
     Provide a lightweight view of the contents of a directory using a 
     provided DRS. Lists DRS contents of files which match the pattern, and
     then lists any others.
 
-    Currently uses normal print, in case we want to introduce some sort of 
-    ordered tree structure.
+    myfiles can be any iterable of names (e.g. a generator over a listing),
+    each name is only visited once.
+
+    Returns a list of output lines rather than printing them, so the caller
+    can decide where they go (e.g. poutput in the command loop).
     """
 
     try:
         drs = drs[1:-1].split(',')
     except:
         raise ValueError(f'DRS provided - {drs} - is not a python list in a string!')
-    contents = {k:[] for k in drs}
-    content_length = {k:0 for k in drs}
+    contents = {k:set() for k in drs}
     skipped = []
     
     collapsed = __get_collapsed(collapse, drs)
 
+    # one group per drs component, stopping at the first '.' (the suffix)
+    pattern = re.compile('_'.join([r'([^_.]*)']*len(drs)) + r'(?:\.|$)')
+
     for f in myfiles:
-        parts = f.split('.')[0].split('_')  
-        if len(parts) == len(drs):
-            for k,p in zip(drs,parts):
-                if p not in contents[k]:
-                    contents[k].append(p)
-                    content_length[k]+=1
-        else:
+        m = pattern.match(f)
+        if m is None:
             skipped.append(f)
+            continue
+        for k,p in zip(drs,m.groups()):
+            contents[k].add(p)
    
-    for k in contents:
-        if k in collapsed and len(contents[k]) > 2:
-            content = sorted(contents[k])
-            print(_i(k),':',_e(f'[{content[0]} ... {content[-1]}] (len={len(content)})'))
-        else: 
-            print(_i(k),':',_e(sorted(contents[k])))
-   
+    return drs_process(contents, collapsed, skipped)
 
-    if len(skipped) > 0:
-        print('')
-        print("The following files did not match the drs structure")
-        for f in skipped:
-            print(_e(f))
+def __freeze(value):
+    """ Lists (and lists of lists) as tuples """
+    if isinstance(value, list):
+        return tuple(__freeze(v) for v in value)
+    return value
+
+def __thaw(value):
+    """ Undo __freeze """
+    if isinstance(value, tuple):
+        return [__thaw(v) for v in value]
+    return value
 
 def drs_metaview(metadata, collapse='[]'):
-    """Provide a drs-like view of the metadata associated with files"""
+    """Provide a drs-like view of the metadata associated with files, as a list of lines"""
 
     collapsed = __get_collapsed(collapse)
 
-    contents = {}
+    contents = defaultdict(set)
     for f,m in metadata:
         for k,v in m.items():
-            if k not in contents:
-                contents[k]=[v]
-            if v not in contents[k]:
-                contents[k].append(v)
+            # json_ encoded metadata values come back as (possibly nested) lists,
+            # which are kept as tuples so they can go in the set
+            contents[k].add(__freeze(v))
+    contents = {k:[__thaw(v) for v in values] for k,values in contents.items()}
+
+    return drs_process(contents, collapsed)
+
 
-    for k in contents:
-        if k in collapsed and len(contents[k]) > 2:
-            content = sorted(contents[k])
-            print(_i(k),':',_e(f'[{content[0]} ... {content[-1]}] (len={len(content)})'))
-        else: 
-            print(_i(k),':',_e(sorted(contents[k])))
-    
-    
 
 if __name__=="__main__":
 
@@ -92,5 +108,5 @@ if __name__=="__main__":
     ]
     drs = '[Variable,Source,Experiment,Variant,Frequency,Period,nField]'
 
-    drs_view(data, drs, collapse='[Period]')
+    print('\n'.join(drs_view(data, drs, collapse='[Period]')))
 
@@ -1,18 +1,34 @@
 import cmd2
+import time
+from collections import OrderedDict
 from pathlib import Path
-from s3v.s3core import get_client, get_locations, lswild, desanitise_metadata
+from s3v.s3core import get_client, get_locations, lswild, desanitise_metadata, glob_matcher
 from s3v.skin import _i, _e, _p, _err, fmt_size, fmt_date
 from minio.deleteobjects import DeleteObject
-from minio.commonconfig import CopySource
+from minio.commonconfig import CopySource, ComposeSource
+from minio.helpers import MAX_PART_SIZE
 from minio.tagging import Tags
+from minio.error import S3Error
 from concurrent.futures import ThreadPoolExecutor, as_completed
+from operator import itemgetter
 from s3v.s3sci import cfread
 from s3v.drs_view import drs_view, drs_metaview
-import bitmath
 
 import logging
 logging.getLogger("urllib3.connectionpool").setLevel(logging.ERROR)
 
+def user_metadata(metadata):
+    """ 
+    Pull the user metadata out of the metadata (headers) for an object,
+    dropping the x-amz-meta- prefix from the keys, and desanitise it.
+    """
+    meta = {}
+    for k,v in metadata.items():
+        k = k.lower()
+        if k.startswith('x-amz-meta-'):
+            meta[k.removeprefix('x-amz-meta-')] = v
+    return desanitise_metadata(meta)
+
 def fetch_metadata(client, bucket, file_dict):
     """ Helper function to clean up calling metadata signature"""
     return file_dict, client.stat_object(bucket, file_dict['n'])
@@ -20,15 +36,81 @@ def fetch_metadata(client, bucket, file_dict):
 def match_metadata(client, bucket, object_name, matches):
     """ Helper function to grab only files with metadata matches"""
     result = client.stat_object(bucket, object_name)
-    meta = {k[11:]:v for k,v in result.metadata.items() if k.startswith('x-amz-meta')}
-    meta = desanitise_metadata(meta)
+    meta = user_metadata(result.metadata)
+    return metadata_matches(meta, matches), object_name
+
+def metadata_matches(meta, matches):
+    """ True if every key-value pair in matches is found in meta """
     for k,v in matches.items():
-        if k not in meta:
-            return False, object_name
+        if k not in meta or meta[k]!=v:
+            return False
+    return True
+
+def remove_batch(client, bucket, delete_list):
+    """ Helper to remove (and force the lazy error iterator for) one batch of objects """
+    return list(client.remove_objects(bucket, delete_list))
+
+def raw_user_metadata(headers):
+    """ The user metadata (x-amz-meta-) headers as stored, with lower case keys """
+    return {k.lower():v for k,v in headers.items() if k.lower().startswith('x-amz-meta-')}
+
+def copy_one(client, bucket, source, target):
+    """ 
+    Helper for mv: server side copy of source (an object from a listing) to target,
+    only removing the source if the copy checks out.
+    """
+    if source.size > MAX_PART_SIZE:
+        # Too big for a single copy request, so this has to be a multipart copy, which
+        # doesn't carry the user metadata, content type or tags across, so we have to.
+        if source.metadata:
+            # a (MinIO) listing with include_user_meta has already told us all of that
+            headers, tags = source.metadata, source.tags
         else:
-            if meta[k]!=v:
-                return False, object_name  
-    return True, object_name
+            # otherwise ask, but not every object store supports tagging
+            headers = client.stat_object(bucket, source.object_name).metadata
+            try:
+                tags = client.get_object_tags(bucket, source.object_name)
+            except S3Error:
+                tags = None
+        metadata = raw_user_metadata(headers)
+        content_type = next((v for k,v in headers.items() if k.lower() == 'content-type'), None)
+        if content_type:
+            metadata['Content-Type'] = content_type
+        result = client.compose_object(bucket, target, [ComposeSource(bucket, source.object_name)],
+                                       metadata=metadata or None, tags=tags)
+        # the result gets a multipart etag, so check the size and metadata of the copy instead
+        copied = client.stat_object(bucket, target)
+        ok = (copied.size == source.size and 
+              raw_user_metadata(copied.metadata) == raw_user_metadata(headers))
+    else:
+        result = client.copy_object(bucket, target, CopySource(bucket, source.object_name))
+        ok = source.etag == result.etag
+    if ok:
+        client.remove_object(bucket, source.object_name)
+    return result, ok
+
+def tag_one(client, bucket, object_name, key, value, merge=False):
+    """ 
+    Helper for tag: set key=value as the tags of an object, or, if merge, 
+    add it to the existing tags (which costs another request). 
+    """
+    tags = None
+    if merge:
+        tags = client.get_object_tags(bucket, object_name)
+    if tags is None:
+        tags=Tags()
+    tags[key]=value
+    client.set_object_tags(bucket, object_name, tags)
+
+def file_entry(o):
+    """ The description of a file (object) from a listing used by the commands """
+    return {'n':o.object_name, 
+            'b':o.size,
+            's':fmt_size(o.size),
+            'd':fmt_date(o.last_modified),
+            't':o.tags,
+            'm':o.metadata or None,
+            }
 
 
 class s3cmd(cmd2.Cmd):
@@ -45,6 +127,14 @@ class s3cmd(cmd2.Cmd):
         self.poutput(_i('You have entered a lightweight management tool for organising "files" inside an S3 object store'))
         self.prompt = 's3> '
         self.debug = False
+        # number of concurrent requests (and so connections) used for per-object work
+        self.max_workers = 32
+        # recent listings used for tab completion, and how long (s) to trust them
+        self._completion_cache = OrderedDict()
+        self.completion_ttl = 5
+        # bucket names per location, and how long (s) to trust them
+        self._bucket_cache = {}
+        self.bucket_ttl = 30
         self.alias, self.bucket, self.path = None, None, None
         if path is None:
             self.prompt = 's3> '
@@ -78,8 +168,8 @@ class s3cmd(cmd2.Cmd):
         if bits[0]!=self.alias:
             self.alias = bits[0]
             self.prompt = _p(f'{self.alias}> ')
-            self.client = get_client(self.alias)
-            self.buckets = [b.name for b in self.client.list_buckets()]
+            self.client = get_client(self.alias, max_connections=self.max_workers)
+            self.buckets = self._list_buckets()
         match len(bits):
             case 1: 
                 self.bucket = None
@@ -91,40 +181,76 @@ class s3cmd(cmd2.Cmd):
                 self.bucket = bits[1]
                 self.path = bits[2]
 
+    def _list_buckets(self, refresh=False):
+        """ 
+        Bucket names at the current location. These rarely change, so only
+        go back to the server if the last listing is more than bucket_ttl
+        seconds old (or if asked to refresh).
+        """
+        now = time.monotonic()
+        cached = self._bucket_cache.get(self.alias)
+        if refresh or cached is None or now - cached[0] >= self.bucket_ttl:
+            cached = (now, [b.name for b in self.client.list_buckets()])
+            self._bucket_cache[self.alias] = cached
+        return cached[1]
+
     def _recurse(self, path, match=None):
         """ 
-        From a given path, head down the tree and do some summing
+        From a given path, head down the tree and do some summing.
+        This is one recursive listing, rather than one per directory, with 
+        the size of everything below a sub-directory added to that 
+        sub-directory (the first component of the name after the path).
         """
         if path == "":
             prefix = None
         else:
             prefix = path
-        objects = self.client.list_objects(self.bucket,include_user_meta=True, prefix=prefix)
-        if match is not None:
-            objects = [o for o in objects if Path(o.object_name).match(match)]
+        start = len(prefix) if prefix else 0
+        matcher = glob_matcher(match) if match is not None else None
 
-        sum  = 0
+        volume  = 0
         files = 0
-        dirs = 1
-        mydirs = []
         myfiles = []
-        for o in objects:
-            if o.is_dir:
-                path = f'{path}/{o.object_name}'
-                dsum, dfiles, ddirs, md, mf = self._recurse(path)
-                sum += dsum
-                files += dfiles
-                dirs += 1
-                mydirs.append([o.object_name, fmt_size(dsum)])
-            else:
-                sum += o.size
-                files +=1
-                myfiles.append({'n':o.object_name, 
-                                's':fmt_size(o.size),
-                                'd':fmt_date(o.last_modified),
-                                't':o.tags,
-                                })
-        return sum, files, dirs, mydirs, myfiles
+        # sizes of the top level sub-directories, in listing order, and those which didn't match
+        dsums = {}
+        unmatched = set()
+        for o in self.client.list_objects(self.bucket, include_user_meta=True, prefix=prefix, recursive=True):
+            slash = o.object_name.find('/', start)
+            if slash < 0:
+                if matcher is None or matcher(o.object_name):
+                    volume += o.size
+                    files +=1
+                    myfiles.append(file_entry(o))
+                continue
+            d = o.object_name[:slash+1]
+            if d not in dsums:
+                if d in unmatched:
+                    continue
+                if matcher is not None and not matcher(d):
+                    unmatched.add(d)
+                    continue
+                dsums[d] = 0
+            dsums[d] += o.size
+            files += 1
+        volume += sum(dsums.values())
+        mydirs = [[d, fmt_size(dsum)] for d, dsum in dsums.items()]
+        return volume, files, 1+len(mydirs), mydirs, myfiles
+
+    def _list_files(self, path, match=None):
+        """ 
+        The files (not directories) at path, optionally matching a wildcard,
+        from a single listing. For commands which only care about the files
+        themselves, so there is no need to walk the tree beneath to add it up.
+        """
+        if path == "":
+            prefix = None
+        else:
+            prefix = path
+        objects = self.client.list_objects(self.bucket,include_user_meta=True, prefix=prefix)
+        if match is not None:
+            matcher = glob_matcher(match)
+            objects = (o for o in objects if matcher(o.object_name))
+        return [file_entry(o) for o in objects if not o.is_dir]
 
     def _cd_lander(self, path):
         """
@@ -162,18 +288,27 @@ class s3cmd(cmd2.Cmd):
         
 
     def _getmetadata(self, myfiles):
+        """ 
+        Return (file, metadata) pairs in the same (listing) order as myfiles, using
+        metadata which came back with the listing (only MinIO does that, and it is
+        only decoded here, when it is wanted), and only going back to the 
+        server for the rest.
+        """
         mymetadata = []
-        # loop runs with minimum of 32 or the number of processors multiplied by 5, based on Python’s default configuration.
-        with ThreadPoolExecutor() as executor:
-            futures = {executor.submit(fetch_metadata, self.client, self.bucket, f): f for f in myfiles}
-            for future in as_completed(futures):
+        # each stat is a round trip to the server, so use as many workers as we have connections
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [None if f['m'] is not None else executor.submit(fetch_metadata, self.client, self.bucket, f)
+                       for f in myfiles]
+            # collecting in submission order means we don't need to sort afterwards
+            for f, future in zip(myfiles, futures):
                 try:
-                    f, result = future.result()
-                    meta = {k[11:]:v for k,v in result.metadata.items() if k.startswith('x-amz-meta')}
-                    mymetadata.append((f, desanitise_metadata(meta)))
+                    if future is None:
+                        mymetadata.append((f, user_metadata(f['m'])))
+                    else:
+                        f, result = future.result()
+                        mymetadata.append((f, user_metadata(result.metadata)))
                 except Exception as e:
-                    self.poutput(_err(f'Error fetching metadata {e}'))
-        mymetadata = sorted(mymetadata, key=lambda x: x[0]['n'])
+                    self.poutput(_err(f'Error fetching metadata for {f["n"]} {e}'))
         return mymetadata
 
     def do_lb(self,arg=None):
@@ -282,23 +417,18 @@ class s3cmd(cmd2.Cmd):
                 if arg.tags:
                     string += f"   {f['t']}"
                 if arg.long or arg.metadata:
-                    if arg.long:
-                        pretty_meta ='  {'
-                    else:
-                        pretty_meta = '\n   {'
                     meta = reorder(meta)
-                    for k,v in meta.items():
-                        pretty_meta += _e(k)+f': {v}, '
-                    string += pretty_meta[:-2]+'}'
+                    pretty_meta = ', '.join([f'{_e(k)}: {v}' for k,v in meta.items()])
+                    string += ('  {' if arg.long else '\n   {') + pretty_meta + '}'
                     if not arg.long:
                         string +='\n'
-                strings.append({'s':string,'d':[f['d']],'v':f['s']})
+                strings.append({'s':string,'d':[f['d']],'b':f['b']})
             
             match arg.order:
                 case None:
                     pass
                 case 'size':
-                    strings = sorted(strings, key=lambda x: bitmath.parse_string(x['v']))
+                    strings = sorted(strings, key=itemgetter('b'))
                 case 'date':
                     strings = sorted(strings, key=lambda x: x['d'])
             for s in strings:
@@ -336,20 +466,33 @@ class s3cmd(cmd2.Cmd):
             else:
                 self.poutput(_err('Invalid key pair: ')+kv)
                 return
-        objects = self.client.list_objects(self.bucket, prefix=self.path)
+        objects = self.client.list_objects(self.bucket, prefix=self.path, include_user_meta=True)
         if path is not None:
-            objects = [o for o in objects if Path(o.object_name).match(path)]
+            matcher = glob_matcher(path)
+            objects = (o for o in objects if matcher(o.object_name))
 
+        # match on metadata from the listing where the server provides it, otherwise stat the object
         matches = []
-        with ThreadPoolExecutor() as executor:
-            futures = {executor.submit(match_metadata, self.client, self.bucket, o.object_name, pairs): o for o in objects}
-            for future in as_completed(futures):
-                try:
-                    status, name = future.result()
-                    if status:
-                        matches.append(name)
-                except Exception as e:
-                    self.poutput(_err(f'Error fetching metadata for {name} {e}'))
+        unknown = []
+        for o in objects:
+            if not o.metadata:
+                unknown.append(o)
+                continue
+            try:
+                if metadata_matches(user_metadata(o.metadata), pairs):
+                    matches.append(o.object_name)
+            except Exception as e:
+                self.poutput(_err(f'Error fetching metadata for {o.object_name} {e}'))
+        if unknown:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(match_metadata, self.client, self.bucket, o.object_name, pairs): o for o in unknown}
+                for future in as_completed(futures):
+                    try:
+                        status, name = future.result()
+                        if status:
+                            matches.append(name)
+                    except Exception as e:
+                        self.poutput(_err(f'Error fetching metadata for {futures[future].object_name} {e}'))
         if matches == []:
             self.poutput(_e('No matches'))
         else:
@@ -370,10 +513,30 @@ class s3cmd(cmd2.Cmd):
         self.path = self.__handle_path(path)
         return self._cd_lander(self.path)
     
+    def _complete_listing(self, prefix):
+        """ 
+        Non-recursive listing of (name, is_dir) pairs used for tab completion.
+        These are kept for a few seconds, so that a burst of key presses costs
+        one LIST rather than one each. Only the most recent 128 are kept.
+        """
+        key = (self.alias, self.bucket, prefix)
+        now = time.monotonic()
+        cached = self._completion_cache.get(key)
+        if cached is not None and now - cached[0] < self.completion_ttl:
+            self._completion_cache.move_to_end(key)
+            return cached[1]
+        listing = [(o.object_name, o.is_dir) for o in 
+                   self.client.list_objects(self.bucket, prefix=prefix, recursive=False)]
+        self._completion_cache[key] = (now, listing)
+        self._completion_cache.move_to_end(key)
+        if len(self._completion_cache) > 128:
+            self._completion_cache.popitem(last=False)
+        return listing
+
     def complete_cd(self, text, line, start_index, end_index):
         """ Used for tab completing directories"""
         prefix = self.__handle_path(text)
-        mydirs = [o.object_name for o in self.client.list_objects(self.bucket,prefix=prefix) if o.is_dir]
+        mydirs = [name for name, is_dir in self._complete_listing(prefix) if is_dir]
         if text:
             return [
                 adir for adir in mydirs
@@ -390,15 +553,17 @@ class s3cmd(cmd2.Cmd):
         Make bucket, return error if existing.
         """
         bucket_name = arg.bucket
-        # update the list
-        self.buckets = [b.name for b in self.client.list_buckets()]
+        # update the list, this needs to be current
+        self.buckets = self._list_buckets(refresh=True)
         
         if bucket_name in self.buckets:
             self.poutput(_err(f'Bucket {bucket_name} already exits')) 
-            self.cb(None)
+            return
         r = self.client.make_bucket(bucket_name)
-        self.buckets.append(bucket_name)
-        return self.do_cb(f'cb {bucket_name}')
+        # the cached listing is now stale
+        self._bucket_cache.pop(self.alias, None)
+        self.buckets = self.buckets + [bucket_name]
+        return self.do_cb(bucket_name)
     
 
     rm_args = cmd2.Cmd2ArgumentParser()
@@ -411,25 +576,36 @@ class s3cmd(cmd2.Cmd):
         if self.bucket is None:
             self.poutput(_err("set bucket first"))
             return
-        objects = []
-        for a in arg.targets:
-            objects = self.client.list_objects(self.bucket, prefix=self.path)
-            objects = [o.object_name for o in objects if Path(o.object_name).match(a)]
+        # list once, and match every target against that one listing
+        names = [o.object_name for o in self.client.list_objects(self.bucket, prefix=self.path)]
+        matchers = [glob_matcher(a) for a in arg.targets]
         # in principle, with wild cards, we could get duplicates
-        objects = list(set(objects))
+        objects = sorted({n for n in names if any(m(n) for m in matchers)})
         if len(objects) > 0:
             self.poutput(_i('\nList of objects for deletion:'))
             self.poutput(_e(" ".join(objects)))
-            if self._confirm(_p('Delete these files from {bucket}?')):
+            if self._confirm(_p(f'Delete these files from {self.bucket}?')):
             
                 delete_list = [DeleteObject(o) for o in objects]
-                # this would be lazy if I didn't force it with the list and error parsing
-                errors = list(self.client.remove_objects(self.bucket, delete_list))
-                if errors != []:
+                # the delete API takes at most 1000 keys per request, so send the batches concurrently
+                batches = [delete_list[i:i+1000] for i in range(0, len(delete_list), 1000)]
+                errors = []
+                failed = 0
+                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                    futures = {executor.submit(remove_batch, self.client, self.bucket, b): b for b in batches}
+                    for future in as_completed(futures):
+                        try:
+                            errors += future.result()
+                        except Exception as e:
+                            # nothing is known about this batch, so count all of it as failed
+                            batch = futures[future]
+                            self.poutput(_err(f"error occurred when deleting {len(batch)} objects: {e}"))
+                            failed += len(batch)
+                if errors != [] or failed:
                     for error in errors:
                         self.poutput(_err(f"error occurred when deleting object {error}"))
                     lf = len(objects)
-                    le = len(errors)
+                    le = len(errors) + failed
                     self.poutput(_p(f"{lf-le}/{lf} files deleted from {self.bucket} in {self.alias}"))
                     self.poutput(_p('You will need to check which files were actually deleted'))
                 else:
@@ -445,50 +621,70 @@ class s3cmd(cmd2.Cmd):
         Rename files within a bucket (server side)
         This is an expensive operation!
         """
+        if self.path is None:
+            self.path = ""
         try:
             source, target = tuple(command.targets)
             self.poutput(_i('Command is mv ')+ source+ _i(' to ')+target)
         except:
             self.poutput(_err(f'Invalid mv command - mv "{command.targets}"'))
-            return self.do_cd(self.path)
+            return self._cd_lander(self.path)
         
-        sfiles = lswild(self.client, self.bucket, source, objects=True)
-        ncopies = len(sfiles)
-        if ncopies == 0:
-            self.poutput(_i('No files match {source}'))
-            return self.do_cd()
-        elif ncopies == 1:
-            if target.endswith('/'):
-                targets = ['f{target}/{sfiles[0].object_name}']
-            else:
-                targets = [target] 
-        elif ncopies > 1:
-            if not target.endswith('/'):
-                self.putput(_err(f'Need a directory target to mv {len(sfiles)} files -  target must end with a /'))
-                return self.do_cd()
-            targets = [f'{target}{o.object_name}' for o in sfiles]
-        volume = fmt_size(sum([o.size for o in sfiles]))
+        sfiles = lswild(self.client, self.bucket, source, objects=True, include_user_meta=True)
+        if len(sfiles) == 0:
+            self.poutput(_i(f'No files match {source}'))
+            return self._cd_lander(self.path)
+        elif len(sfiles) > 1 and not target.endswith('/'):
+            self.poutput(_err(f'Need a directory target to mv {len(sfiles)} files -  target must end with a /'))
+            return self._cd_lander(self.path)
+
+        total = 0
+        targets = []
+        for o in sfiles:
+            total += o.size
+            targets.append(f'{target}{o.object_name}' if target.endswith('/') else target)
+        volume = fmt_size(total)
 
         self.poutput(_i('\nList of movements:'))
         for o,t in zip(sfiles,targets):
             self.poutput(_e(f'mv {o.object_name} to {t}'))
         self.poutput(_p('This move is done as a server side copy - it is not "just" a rename!'))
         if self._confirm(_p(f'Move these files ({volume}) ?')):
-            for o,t in zip(sfiles, targets):
-                src = CopySource(self.bucket, o.object_name)
-                result = self.client.copy_object(self.bucket, t, src)
-                if o.etag != result.etag:
-                    self.poutput(_err(f'Failed copy of {o.object_name} - mv operation terminated'))
-                    return self.cd(self.path)
-                self.poutput(f'Created {_e(result.object_name)}')
-                self.client.remove_object(self.bucket,o.object_name)
+            # copies are latency bound, so overlap them, but stop at the first failure. Copies 
+            # already under way can't be stopped, so keep collecting them and report what happened.
+            terminated = False
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(copy_one, self.client, self.bucket, o, t): o for o,t in zip(sfiles, targets)}
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    o = futures[future]
+                    try:
+                        result, ok = future.result()
+                    except Exception as e:
+                        self.poutput(_err(str(e)))
+                        ok = False
+                    if ok:
+                        self.poutput(f'Created {_e(result.object_name)}')
+                    elif terminated:
+                        self.poutput(_err(f'Failed copy of {o.object_name}'))
+                    else:
+                        self.poutput(_err(f'Failed copy of {o.object_name} - mv operation terminated'))
+                        terminated = True
+                        for f in futures:
+                            f.cancel()
+            if terminated:
+                skipped = [futures[f].object_name for f in futures if f.cancelled()]
+                if skipped:
+                    self.poutput(_err(f'Not moved ({len(skipped)}): ') + ' '.join(skipped))
 
-        return self.do_cd(self.path)
+        return self._cd_lander(self.path)
 
     tag_args = cmd2.Cmd2ArgumentParser()
     tag_args.add_argument('path', nargs=1,help='Path should be a valid object match (i.e. an object path, possibly with a wildcard).')
     tag_args.add_argument('value',nargs=1, help='Value for tag')
     tag_args.add_argument('key', nargs=1,help='Key for a tag')
+    tag_args.add_argument('-m', '--merge', action='store_true', help='Keep any existing tags (costs an extra request per object)')
     @cmd2.with_argparser(tag_args)
     def do_tag(self, targets):
         """
@@ -500,23 +696,33 @@ class s3cmd(cmd2.Cmd):
         if self.bucket is None:
             self.poutput(_err('Need to set bucket before tagging anything'))
             return 
-        prefix = targets.path
+        prefix = targets.path[0]
         key = targets.key[0]
         value = targets.value[0]
-        objects = self.client.list_objects(self.bucket,prefix=prefix)
-        for o in objects:
-            if o.is_dir:
-                continue
-            tags = o.tags
-            if tags is None:
-                tags=Tags()
-            tags[key]=value
-            try:
-                self.client.set_object_tags(self.bucket, o.object_name, tags)
-            except Exception as e:
-                self.poutput(_err(e))
-                self.poutput(_err('Unable to tag object(s), your object store implementation may not support this'))
-                return
+        objects = [o for o in self.client.list_objects(self.bucket,prefix=prefix) if not o.is_dir]
+        # one request per object, so overlap them, but give up at the first failure. Requests 
+        # already under way can't be stopped, so keep collecting them and report what happened.
+        failed = False
+        tagged = []
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(tag_one, self.client, self.bucket, o.object_name, key, value, targets.merge): o.object_name 
+                       for o in objects}
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                try:
+                    future.result()
+                    tagged.append(futures[future])
+                except Exception as e:
+                    self.poutput(_err(f'{futures[future]}: {e}'))
+                    if not failed:
+                        failed = True
+                        for f in futures:
+                            f.cancel()
+        if failed:
+            self.poutput(_err('Unable to tag object(s), your object store implementation may not support this'))
+            if tagged:
+                self.poutput(_i(f'Tagged {len(tagged)} of {len(objects)} objects before stopping: ') + ' '.join(sorted(tagged)))
 
     tag1_args = cmd2.Cmd2ArgumentParser()
     tag1_args.add_argument('path', nargs=1,help='Path should be a valid object match (i.e. an object path, possibly with a wildcard).')
@@ -559,14 +765,15 @@ class s3cmd(cmd2.Cmd):
         if self.path is None:
             self.path = '/'
         extras = arg.path
-        volume, nfiles, ndirs, mydirs, myfiles = self._recurse(self.path, extras)
+        myfiles = self._list_files(self.path, extras)
 
         if arg.use_metadata:
             mymetadata = self._getmetadata(myfiles)
-            drs_metaview(mymetadata, collapse=arg.short)
+            lines = drs_metaview(mymetadata, collapse=arg.short)
         else:
-            myfiles = [f['n'] for f in myfiles]
-            drs_view(myfiles, arg.drs, collapse=arg.short)
+            lines = drs_view((f['n'] for f in myfiles), arg.drs, collapse=arg.short)
+        for line in lines:
+            self.poutput(line)
             
         
     cfd_args = cmd2.Cmd2ArgumentParser()
@@ -585,17 +792,20 @@ class s3cmd(cmd2.Cmd):
                 self.path = '/'
         
             extras = arg.object[0]
-            volume, nfiles, ndirs, mydirs, myfiles = self._recurse(self.path, extras)
+            myfiles = self._list_files(self.path, extras)
             input_files = [f['n'] for f in myfiles]
             self.poutput(_i(f'Detailed listing for {len(myfiles)} files may be slow, consider using -m option instead (if possible).'))
         else:
             input_files = [arg.object[0],]
 
+        # cf.read isn't thread safe (and the hdf5 reads underneath are serialised anyway), so
+        # these are done one at a time, but one unreadable file shouldn't stop the rest.
         for input_file in input_files:
-            flist, output = cfread(self.alias,self.bucket, self.path, input_file, 
-                                short= arg.short, complete=arg.complete)
-            for o in output:
-                self.poutput(o)
+            try:
+                cfread(self.alias, self.bucket, self.path, input_file, 
+                       short=arg.short, complete=arg.complete, out=self.poutput)
+            except Exception as e:
+                self.poutput(_err(f'Unable to read {input_file}: {e}'))
 
     def complete_cflist(self, text, line, start_index, end_index):
         """ Used for tab completing cfdump """
@@ -605,7 +815,7 @@ class s3cmd(cmd2.Cmd):
             raise ValueError('Cannot tab complete wildcards')
         
         prefix = self.__handle_path(text)
-        myobjs = [o.object_name for o in self.client.list_objects(self.bucket,prefix=prefix) if not o.is_dir]
+        myobjs = [name for name, is_dir in self._complete_listing(prefix) if not is_dir]
         if text:
             return [
                 adir for adir in myobjs
@@ -1,18 +1,33 @@
 from pathlib import Path
+import os
+import re
 import json
+import fnmatch
+import certifi
+from functools import lru_cache
+import urllib3
+from urllib3.util import Retry, Timeout
 from minio import Minio
 from urllib.parse import quote, unquote
 
-def get_locations(config_file='.mc/config.json'):
-    """ 
-    Read config file and find usable locations
-    """
+# metadata keys use dashes rather than spaces or underscores
+_KEY_TBL = str.maketrans({' ':'-', '_':'-'})
+
+@lru_cache(maxsize=4)
+def _read_locations(config_file):
+    """ Parse the config file for usable locations. This is cached, so it only happens once per session """
     config = Path.home()/config_file
     with open(config,'r') as jfile:
         jdata = json.load(jfile)
     jd = jdata['aliases']
-    locations = {x:jd[x] for x in jd if jd[x]['api']=='S3v4'}
-    return locations
+    return {x:jd[x] for x in jd if jd[x]['api']=='S3v4'}
+
+def get_locations(config_file='.mc/config.json'):
+    """ 
+    Read config file and find usable locations. The file is only parsed once,
+    and each caller gets its own copy, so changing it can't affect anyone else.
+    """
+    return {k:dict(v) for k,v in _read_locations(str(config_file)).items()}
 
 
 def get_user_config(target, config_file='.mc/config.json'):
@@ -21,16 +36,34 @@ def get_user_config(target, config_file='.mc/config.json'):
     """
     options = get_locations(config_file)
     try:
-        options = get_locations(config_file)
         return options[target]
     except KeyError:
         raise ValueError(f'Minio target [{target}] not found in ~/{config_file}')
 
 
-def get_client(alias):
+def get_http_client(maxsize=32):
+    """
+    Build the connection pool used by the Minio client. This is minio's own
+    default, except that the pool is sized (and blocks when exhausted) to
+    match our threaded fan-out, rather than discarding connections (and
+    redoing TLS handshakes) whenever more than ten requests are in flight.
+    """
+    timeout = 300
+    return urllib3.PoolManager(
+        timeout=Timeout(connect=timeout, read=timeout),
+        maxsize=maxsize,
+        block=True,
+        cert_reqs='CERT_REQUIRED',
+        ca_certs=os.environ.get('SSL_CERT_FILE') or certifi.where(),
+        retries=Retry(total=5, backoff_factor=0.2, status_forcelist=[500, 502, 503, 504])
+    )
+
+def get_client(alias, max_connections=32):
     """
     Get Minio client from the configuration alias, and patch the 
-    client with that alias name
+    client with that alias name. max_connections sizes the HTTP
+    connection pool, and should match the width of any thread pools
+    which share the client.
     """
     credentials = get_user_config(alias)
     secure = False
@@ -43,6 +76,7 @@ def get_client(alias):
         except KeyError:
             raise KeyError(f"Cannot find {v} in credentials supplied")
         kw['secure'] = secure
+        kw['http_client'] = get_http_client(max_connections)
         endpoint = kw['endpoint']
         slashes = endpoint.find('//')
         if slashes > -1:
@@ -54,33 +88,57 @@ def get_client(alias):
     client.alias_name = alias
     return client
 
-def lswild(client, bucket, pattern='*', objects=False):
+def _path_parts(path):
+    """ Split a path into components the way PurePosixPath does, with '/' as the first part of an absolute path """
+    parts = [p for p in path.split('/') if p and p != '.']
+    if path.startswith('/'):
+        # posix keeps exactly two leading slashes as a distinct root
+        parts.insert(0, '//' if path.startswith('//') and not path.startswith('///') else '/')
+    return parts
+
+def glob_matcher(pattern):
+    """
+    Compile a glob pattern once and return a function which tests object names
+    against it, with the same semantics as Path(name).match(pattern): a relative
+    pattern matches the trailing components of the name, an absolute one the
+    whole name, and each component is matched as fnmatch would (which is what
+    Path.match uses). Use this rather than Path.match inside loops over listings.
+    """
+    pat_parts = _path_parts(pattern)
+    if not pat_parts:
+        raise ValueError('empty pattern')
+    absolute = pat_parts[0] in ('/', '//')
+    matchers = [re.compile(fnmatch.translate(p)).match for p in reversed(pat_parts)]
+    def match(name):
+        parts = _path_parts(name)
+        if len(parts) < len(matchers) or (absolute and len(parts) != len(matchers)):
+            return False
+        return all(m(p) is not None for m, p in zip(matchers, reversed(parts)))
+    return match
+
+def lswild(client, bucket, pattern='*', objects=False, include_user_meta=False):
     """ 
     Do an ls on a bucket visible on the minio client which matches pattern
     This isn't quite a perfect glob! So be careful. Also, we're being cunning
     in trying to get the server to try and do some of the matching, at least
-    for simple cases.
+    for simple cases: everything before the first wildcard is sent as the
+    listing prefix, and the whole pattern is matched here.
+    Only objects are returned, not the directories (common prefixes) in the listing.
     If objects is False, return just names, oterwise return the objects
-    for later processing
+    for later processing. include_user_meta asks for user metadata (and tags) 
+    in the listing, which only MinIO provides.
     """
-    
-    asterix = pattern.find('*')
-    
-    if asterix > 0:
-        prefix = pattern[0:asterix]
-        pattern = pattern[asterix:]
-    else:
-        prefix = None
-    
-    objects = client.list_objects(bucket, prefix=prefix)
-    
-    if objects:
-        olist = [o for o in objects if Path(o.object_name).match(pattern)]
-        return olist
-    else:
-        object_names = [o.object_name for o in objects]
-        flist = [p for p in object_names if Path(p).match(pattern)]
-        return flist
+    wild = re.search(r'[*?[]', pattern)
+    prefix = pattern[:wild.start()] if wild else pattern
+    # a / after the first wildcard means the matches are further down the tree
+    recursive = wild is not None and '/' in pattern[wild.start():]
+
+    listing = client.list_objects(bucket, prefix=prefix or None, recursive=recursive,
+                                  include_user_meta=include_user_meta)
+
+    matcher = glob_matcher(pattern)
+    return [o if objects else o.object_name for o in listing 
+            if not o.is_dir and matcher(o.object_name)]
 
 def sanitise_metadata(indict):
     """ 
@@ -89,15 +147,9 @@ def sanitise_metadata(indict):
     encodes keys in lower case, can't do anhyting about
     that.
     """
-    outdict = {}
-    for k,value in indict.items():
-        kk = k.replace(' ', '-').replace('_', '-').lower()
-        if isinstance(value,list):
-            sanitised_value = "json_"+quote(json.dumps(value))
-            outdict[kk] = sanitised_value
-        else: 
-            outdict[kk]=quote(value)
-    return outdict
+    return {k.translate(_KEY_TBL).lower(): 
+                "json_"+quote(json.dumps(value)) if isinstance(value,list) else quote(value)
+            for k,value in indict.items()}
 
 def desanitise_metadata(indict):
     """ 
@@ -105,10 +157,5 @@ def desanitise_metadata(indict):
     have been encoded for an object store, undo
     that sanitation.
     """
-    outdict = {}
-    for k,v in indict.items():
-        if v.startswith('json_'):
-            outdict[k]=json.loads(unquote(v[5:]))
-        else:
-            outdict[k]=unquote(v)
-    return outdict
\ No newline at end of file
+    return {k: json.loads(unquote(v[5:])) if v.startswith('json_') else unquote(v)
+            for k,v in indict.items()}
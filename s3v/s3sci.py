@@ -1,28 +1,12 @@
-from io import StringIO 
-import sys
+import contextlib
+import io
+
 import cf
 from s3v.s3core import get_user_config
 
-class Capturing(list):
-    """ 
-    Used to capture output from science functions that have internal print statements.
-    Usage for calling my_function:
-        with Capturing() as output_list:
-            my_function(my_arguments)
-    output_list will be a list of output strings
-    """
-    def __enter__(self):
-        self._stdout = sys.stdout
-        sys.stdout = self._stringio = StringIO()
-        return self
-    def __exit__(self, *args):
-        self.extend(self._stringio.getvalue().splitlines())
-        del self._stringio    # free up some memory
-        sys.stdout = self._stdout
-
-def cfread(alias, bucket, path, object, short=False, complete=False):
+def cfopen(alias, bucket, path, object):
     """ 
-    Read and lazy load cf fields from a particular path via S3
+    Lazy load the cf fields from a particular path via S3
     """
     credentials = get_user_config(alias)
     storage_options = {
@@ -38,17 +22,36 @@ def cfread(alias, bucket, path, object, short=False, complete=False):
     fstart = credentials['url'].replace('http','s3')+'/'
     fstart = fstart.replace('s3s:','s3:')
     fpath = fstart +'/'.join(bits)
-    with Capturing() as output:
-        flist = cf.read(fpath,storage_options=storage_options)
-        if complete:
-            for f in flist:
-                print(f.dump())
-        elif short:
-            print(flist)
-        else:
-            for f in flist:
-                print(f)
-    return flist, output
+    return cf.read(fpath,storage_options=storage_options)
+
+def cfdescribe(flist, short=False, complete=False, out=print):
+    """ 
+    Describe a list of cf fields, passing each description to out as it is made
+    """
+    if complete:
+        for f in flist:
+            out(f.dump(display=False))
+    elif short:
+        out(str(flist))
+    else:
+        for f in flist:
+            out(str(f))
+
+def cfread(alias, bucket, path, object, short=False, complete=False, out=print):
+    """ 
+    Read and lazy load cf fields from a particular path via S3,
+    and describe them via out.
+    """
+    # anything cf prints while reading goes to out too, not straight to stdout
+    buffer = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buffer):
+            flist = cfopen(alias, bucket, path, object)
+    finally:
+        if buffer.getvalue():
+            out(buffer.getvalue().rstrip('\n'))
+    cfdescribe(flist, short=short, complete=complete, out=out)
+    return flist
 
     
 def test_s3():
@@ -56,8 +59,7 @@ def test_s3():
     bucket ='bnl'
     path = ''
     object = 'common_cl_a.nc'
-    flist, output = cfread(alias, bucket, path, object)
-    print(output)
+    flist = cfread(alias, bucket, path, object)
 
 
 if __name__=="__main__":
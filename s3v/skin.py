@@ -1,8 +1,13 @@
+from functools import lru_cache
 from cmd2 import Bg, Fg, ansi
 
+# the ansi (prefix, suffix) pair for each foreground colour, so we don't rebuild them for every string
+_STYLES = {c.name.lower(): tuple(ansi.style('\0', fg=c).split('\0')) for c in Fg}
+
 def __style(string, col):
     """ Colour a string with a particular style """
-    return ansi.style(string, fg=Fg[col.upper()])
+    prefix, suffix = _STYLES[col]
+    return f'{prefix}{string}{suffix}'
 
 def _i(string, col='green'):
     """ Info string """
@@ -19,14 +24,16 @@ def _p(string, col='magenta'):
 def _err(string,col='red'):
     return __style(string,col)
 
+_UNITS = ("", "Ki", "Mi", "Gi", "Ti", "Pi", "Ei", "Zi", "Yi")
+
+@lru_cache(maxsize=8192)
 def fmt_size(num, suffix="B"):
     """ Take the sizes and humanize them """
-    for unit in ("", "Ki", "Mi", "Gi", "Ti", "Pi", "Ei", "Zi"):
-        if abs(num) < 1024.0:
-            return f"{num:3.1f}{unit}{suffix}"
-        num /= 1024.0
-    return f"{num:.1f}Yi{suffix}"
+    # each unit is ten more bits, so the bit length of the size picks the unit directly
+    n = min(max(int(abs(num)).bit_length()-1, 0)//10, len(_UNITS)-1)
+    return f"{num/(1<<(10*n)):3.1f}{_UNITS[n]}{suffix}"
 
+@lru_cache(maxsize=8192)
 def fmt_date(adate):
     """ Take the reported date and humanize it"""
     return adate.strftime('%Y-%m-%d %H:%M:%S %Z')
@@ -1,9 +1,17 @@
 import pytest
+from pathlib import Path
 from unittest.mock import MagicMock
-from s3v.s3core import get_client, get_locations
-from s3v.s3cmd import s3cmd
+from s3v.s3core import get_client, get_locations, glob_matcher, lswild, sanitise_metadata, desanitise_metadata
+from s3v.s3cmd import s3cmd, copy_one
+from s3v.drs_view import drs_view, drs_metaview
+from s3v.skin import fmt_size
+from s3v import s3sci
+from minio.helpers import MAX_PART_SIZE
+from minio.tagging import Tags
+from minio.error import S3Error
 import time
 import json
+import sys
 
 dummy_config = '{"loc1":{"url":"https://blah.com","accessKey":"a key","secretKey":"b key","api":"S3v3"}}'
 
@@ -12,6 +20,7 @@ dummy_config = '{"loc1":{"url":"https://blah.com","accessKey":"a key","secretKey
 @pytest.fixture
 def mock_s3v(mocker):
     mocker.patch('s3v.s3core.get_client')
+    mocker.patch('s3v.s3cmd.get_client')
     mocker.patch('s3v.s3core.get_locations', return_value=json.loads(dummy_config))
     app = s3cmd(path='loc1')
     app.client = MagicMock()
@@ -38,9 +47,182 @@ def test_do_cb_changes_bucket(capsys, mock_s3v):
 
     new_bucket = 'bucket1'
     
+    # the app was made during fixture setup, when pytest had a different stdout
+    mock_s3v.stdout = sys.stdout
+
     # Call the method under test
     mock_s3v.do_cb(new_bucket)
-    captured = capsys.readstderr()
+    captured = capsys.readouterr()
 
     print(captured.out)
-    
\ No newline at end of file
+    
+
+
+def test_drs_view_skips_non_matching():
+    files = ['a_b.nc', 'a_c.nc', 'other.nc']
+    lines = drs_view(files, '[p,q]')
+    assert 'other.nc' in lines[-1]
+    assert "'b', 'c'" in lines[1]
+
+
+def test_drs_metaview_handles_list_values():
+    metadata = [('f1', {'a': 'x', 'b': [1, 2]}), ('f2', {'a': 'y', 'b': [1, 2]})]
+    lines = drs_metaview(metadata)
+    assert len(lines) == 2
+    assert "'x', 'y'" in lines[0]
+    assert "[[1, 2]]" in lines[1]
+    metadata = [('f1', {'b': [1, [2, 3]]}), ('f2', {'b': [0]})]
+    assert "[[0], [1, [2, 3]]]" in drs_metaview(metadata)[0]
+
+
+@pytest.mark.parametrize('pattern', ['*', '*.nc', 'x*', 'd1/*', 'e/*', '?.nc', '[xy]*', '[!x]*', 'd1', '/d1/*',
+                                     '[^x]*', '[z-a]*', 'a[!]b]', '[]x]*', '[!]]*', '[a-]*', '[*'])
+def test_glob_matcher_agrees_with_path_match(pattern):
+    names = ['a.nc', 'd1/x.nc', 'd1/e/y.nc', 'd1/', 'x_y.txt', '/d1/x.nc', 'x.nc', '^x', ']x', 'a]b', 'axb', '-a', '[x']
+    matcher = glob_matcher(pattern)
+    for name in names:
+        assert matcher(name) == Path(name).match(pattern)
+
+def test_metadata_sanitisation_round_trip():
+    meta = {'Standard_Name': 'air temperature', 'shape': [1, 2, 3], 'units': 'K/s°'}
+    sanitised = sanitise_metadata(meta)
+    assert set(sanitised) == {'standard-name', 'shape', 'units'}
+    assert sanitised['shape'].startswith('json_')
+    assert desanitise_metadata(sanitised) == {'standard-name': 'air temperature', 'shape': [1, 2, 3], 'units': 'K/s°'}
+    # values which other json encoders would change survive the round trip
+    odd = sanitise_metadata({'v': [float('nan'), 2**64]})
+    assert str(desanitise_metadata(odd)['v']) == str([float('nan'), 2**64])
+    # values written with compact separators come back too
+    assert desanitise_metadata({'shape': 'json_%5B1%2C2%5D'}) == {'shape': [1, 2]}
+
+
+def _big_source(metadata=None, tags=None):
+    """ A listing entry for an object too big for a single copy request """
+    return MagicMock(object_name='big.nc', size=MAX_PART_SIZE+1, metadata=metadata, tags=tags)
+
+def _big_copy_client(copied_metadata):
+    """ Mock client for a multipart copy, where the copy ends up with copied_metadata """
+    client = MagicMock()
+    client.stat_object.return_value = MagicMock(size=MAX_PART_SIZE+1, metadata=copied_metadata)
+    return client
+
+def test_copy_one_large_object_keeps_listing_metadata_and_tags():
+    tags = Tags()
+    tags['project'] = 'x'
+    source = _big_source({'X-Amz-Meta-Standard-Name': 'air%20temperature', 'content-type': 'application/x-netcdf'}, tags)
+    client = _big_copy_client({'X-Amz-Meta-Standard-Name': 'air%20temperature'})
+    result, ok = copy_one(client, 'b', source, 'new/big.nc')
+    assert ok
+    client.copy_object.assert_not_called()
+    client.get_object_tags.assert_not_called()
+    # the only stat is of the copy
+    client.stat_object.assert_called_once_with('b', 'new/big.nc')
+    kwargs = client.compose_object.call_args.kwargs
+    assert kwargs['metadata'] == {'x-amz-meta-standard-name': 'air%20temperature',
+                                  'Content-Type': 'application/x-netcdf'}
+    assert kwargs['tags'] is tags
+    client.remove_object.assert_called_once_with('b', 'big.nc')
+
+def test_copy_one_large_object_without_tagging_support():
+    # no metadata in the listing, so it comes from a stat, and the store doesn't do tags
+    client = _big_copy_client({'X-Amz-Meta-Units': 'K'})
+    client.get_object_tags.side_effect = S3Error(response=MagicMock(), code='NotImplemented', message='',
+                                                 resource='/b/big.nc', request_id='', host_id='')
+    result, ok = copy_one(client, 'b', _big_source({}), 'new/big.nc')
+    assert ok
+    kwargs = client.compose_object.call_args.kwargs
+    assert kwargs['metadata'] == {'x-amz-meta-units': 'K'}
+    assert kwargs['tags'] is None
+    client.remove_object.assert_called_once_with('b', 'big.nc')
+
+def test_copy_one_large_object_keeps_source_if_metadata_lost():
+    client = _big_copy_client({})
+    source = _big_source({'X-Amz-Meta-Units': 'K'})
+    result, ok = copy_one(client, 'b', source, 'new/big.nc')
+    assert not ok
+    client.remove_object.assert_not_called()
+
+def _obj(name, size=None, is_dir=False):
+    """ A listing entry as returned by list_objects """
+    return MagicMock(object_name=name, size=size, is_dir=is_dir, metadata=None)
+
+def test_do_rm_matches_every_target(mock_s3v, mocker):
+    mock_s3v.bucket = 'bucket1'
+    mock_s3v.path = ''
+    mock_s3v.client.list_objects.return_value = [
+        _obj('a.nc', 1), _obj('b.nc', 1), _obj('c.txt', 1), _obj('d.txt', 1)]
+    mock_s3v.client.remove_objects.return_value = []
+    mocker.patch.object(mock_s3v, '_confirm', return_value=True)
+    mock_s3v.do_rm('*.nc c.txt a.nc')
+    bucket, deleted = mock_s3v.client.remove_objects.call_args.args
+    assert [d.name for d in deleted] == ['a.nc', 'b.nc', 'c.txt']
+
+def test_do_rm_counts_a_failed_batch(capsys, mock_s3v, mocker):
+    mock_s3v.stdout = sys.stdout
+    mock_s3v.bucket = 'bucket1'
+    mock_s3v.path = ''
+    mock_s3v.client.list_objects.return_value = [_obj('a.nc', 1), _obj('b.nc', 1)]
+    mock_s3v.client.remove_objects.side_effect = ConnectionError('connection reset')
+    mocker.patch.object(mock_s3v, '_confirm', return_value=True)
+    mock_s3v.do_rm('*.nc')
+    out = capsys.readouterr().out
+    assert 'connection reset' in out
+    assert '0/2 files deleted' in out
+
+@pytest.mark.parametrize('size,expected', [(0, '0.0B'), (1023, '1023.0B'), (1024, '1.0KiB'), (2048, '2.0KiB'),
+                                           (1048575, '1024.0KiB'), (1048576, '1.0MiB'), (-2048, '-2.0KiB'),
+                                           (5*2**40, '5.0TiB'), (2**80, '1.0YiB'), (2**90, '1024.0YiB')])
+def test_fmt_size(size, expected):
+    assert fmt_size(size) == expected
+
+def test_lswild_skips_directories():
+    client = MagicMock()
+    client.list_objects.return_value = [_obj('a.nc', 1), _obj('b.txt', 1), _obj('d1/', is_dir=True)]
+    assert lswild(client, 'bucket1', '*') == ['a.nc', 'b.txt']
+    assert lswild(client, 'bucket1', '*.nc', objects=True) == [client.list_objects.return_value[0]]
+    assert client.list_objects.call_args.kwargs == {'prefix': None, 'recursive': False, 'include_user_meta': False}
+
+def test_lswild_lists_recursively_for_wildcard_directories():
+    client = MagicMock()
+    client.list_objects.return_value = [_obj('d1/x.nc', 1), _obj('d1/e/x.nc', 1), _obj('d2/x.nc', 1)]
+    assert lswild(client, 'bucket1', 'd*/x.nc') == ['d1/x.nc', 'd2/x.nc']
+    assert client.list_objects.call_args.kwargs == {'prefix': 'd', 'recursive': True, 'include_user_meta': False}
+
+def test_recurse_sizes_per_subdirectory(mock_s3v):
+    mock_s3v.bucket = 'bucket1'
+    mock_s3v.client.list_objects.return_value = [
+        _obj('a.nc', 10), _obj('d1/e/y.nc', 1000), _obj('d1/x.nc', 100), _obj('d2/z', 5)]
+    volume, nfiles, ndirs, mydirs, myfiles = mock_s3v._recurse('')
+    assert (volume, nfiles, ndirs) == (1115, 4, 3)
+    assert mydirs == [['d1/', fmt_size(1100)], ['d2/', fmt_size(5)]]
+    assert [f['n'] for f in myfiles] == ['a.nc']
+    # one listing for the whole tree
+    mock_s3v.client.list_objects.assert_called_once()
+    assert mock_s3v.client.list_objects.call_args.kwargs['recursive']
+
+def test_recurse_match_skips_unmatched_subdirectories(mock_s3v):
+    mock_s3v.bucket = 'bucket1'
+    mock_s3v.client.list_objects.return_value = [
+        _obj('top/a.nc', 10), _obj('top/d1/x.nc', 100), _obj('top/d2/z', 5)]
+    volume, nfiles, ndirs, mydirs, myfiles = mock_s3v._recurse('top/', 'd2')
+    assert (volume, nfiles, mydirs, myfiles) == (5, 1, [['top/d2/', fmt_size(5)]], [])
+
+def test_bad_listing_metadata_only_affects_its_file(mock_s3v):
+    mock_s3v.bucket = 'bucket1'
+    good, bad = _obj('a.nc', 1), _obj('b.nc', 1)
+    good.metadata = {'X-Amz-Meta-Units': 'K', 'content-type': 'application/x-netcdf'}
+    bad.metadata = {'X-Amz-Meta-Shape': 'json_%5Bnot%20json'}
+    mock_s3v.client.list_objects.return_value = [good, bad]
+    volume, nfiles, ndirs, mydirs, myfiles = mock_s3v._recurse('')
+    assert nfiles == 2
+    assert mock_s3v._getmetadata(myfiles) == [(myfiles[0], {'units': 'K'})]
+    mock_s3v.client.stat_object.assert_not_called()
+
+def test_cfread_sends_cf_output_to_out(mocker):
+    def noisy_open(*args):
+        print('WARNING: some cf message')
+        return ['field']
+    mocker.patch.object(s3sci, 'cfopen', side_effect=noisy_open)
+    lines = []
+    assert s3sci.cfread('loc1', 'bucket1', '', 'a.nc', short=True, out=lines.append) == ['field']
+    assert lines == ['WARNING: some cf message', "['field']"]